@@ -2,25 +2,60 @@
 """
 Adobe Hackathon 2025: "Connecting the Dots" - Final Orchestrator
 """
-import json, logging
+import argparse, logging, os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from process_pdfs import PDFStructureExtractor
+from process_pdfs import PDFStructureExtractor, list_pdf_files, list_subfolders, write_outline_json
 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-worker extractor, built once by the pool initializer
+_EXTRACTOR = None
+
+def _init_worker(cache_dir=None):
+    global _EXTRACTOR
+    _EXTRACTOR = PDFStructureExtractor(cache_dir)
+
+def _extract_one(pdf_path: str):
+    """Pool task: extract the outline of a single PDF in a worker process."""
+    return _EXTRACTOR.extract_pdf_outline(pdf_path)
+
 class ChallengeOrchestrator:
-    def __init__(self, input_dir="input", output_dir="output"):
+    def __init__(self, input_dir="input", output_dir="output", use_cache=False):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.structure_extractor = PDFStructureExtractor()
+        # Opt-in: reuse extractions of unchanged PDFs across runs (handy when iterating locally)
+        self.cache_dir = str(self.output_dir / ".cache") if use_cache else None
+        self.structure_extractor = PDFStructureExtractor(self.cache_dir)
         
+    def _extract_outlines(self, pdf_files):
+        """Yield (pdf_file, result) pairs, fanning out to a process pool for batches."""
+        if len(pdf_files) == 1:
+            # Not worth the pool startup cost for a single file
+            pdf_file = pdf_files[0]
+            yield pdf_file, self.structure_extractor.extract_pdf_outline(str(pdf_file))
+            return
+
+        workers = min(len(pdf_files), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.cache_dir,)) as ex:
+            futures = [ex.submit(_extract_one, str(p)) for p in pdf_files]
+            for pdf_file, future in zip(pdf_files, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # extract_pdf_outline handles its own errors, so this is a pool
+                    # failure (e.g. BrokenProcessPool); report it like any other
+                    logger.error(f"Worker failed on {pdf_file.name}: {e}")
+                    result = {"title": "", "outline": [], "error": str(e)}
+                yield pdf_file, result
 
     def run_round_1a(self, folder_path: Path):
         logger.info(f"--- Running Round 1A on folder: {folder_path.name} ---")
-        pdf_files = list(folder_path.glob("*.pdf"))
+        pdf_files = list_pdf_files(folder_path)
         logger.info(f"Found {len(pdf_files)} PDF files: {[f.name for f in pdf_files]}")
         
         if not pdf_files: 
@@ -31,12 +66,10 @@ class ChallengeOrchestrator:
         output_1a_dir.mkdir(exist_ok=True)
         logger.info(f"Output directory: {output_1a_dir}")
         
-        for pdf_file in pdf_files:
+        for pdf_file, result in self._extract_outlines(pdf_files):
             try:
-                result = self.structure_extractor.extract_pdf_outline(str(pdf_file))
                 output_path = output_1a_dir / f"{pdf_file.stem}_outline.json"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=4, ensure_ascii=False)
+                write_outline_json(result, output_path)
                 logger.info(f"Saved 1A outline to {output_path}")
             except Exception as e:
                 logger.error(f"Error in Round 1A on {pdf_file.name}: {e}")
@@ -53,29 +86,30 @@ class ChallengeOrchestrator:
             return
         
         # Process PDFs directly in input folder
-        direct_pdfs = list(self.input_dir.glob("*.pdf"))
+        direct_pdfs = list_pdf_files(self.input_dir)
         if direct_pdfs:
             logger.info(f"Found {len(direct_pdfs)} PDFs directly in input folder")
-            self.process_pdfs_in_folder(self.input_dir, "input")
+            self.process_pdfs_in_folder(self.input_dir, "input", direct_pdfs)
         
         # Process PDFs in all subfolders
-        subfolders = [f for f in self.input_dir.iterdir() if f.is_dir()]
+        subfolders = list_subfolders(self.input_dir)
         logger.info(f"Found subfolders: {[f.name for f in subfolders]}")
         
         for folder in subfolders:
-            pdf_files = list(folder.glob("*.pdf"))
+            pdf_files = list_pdf_files(folder)
             if pdf_files:
                 logger.info(f"Processing {len(pdf_files)} PDFs in folder: {folder.name}")
-                self.process_pdfs_in_folder(folder, folder.name)
+                self.process_pdfs_in_folder(folder, folder.name, pdf_files)
             else:
                 logger.info(f"No PDFs found in folder: {folder.name}")
         
         logger.info("All tasks completed.")
 
-    def process_pdfs_in_folder(self, folder_path: Path, folder_name: str):
-        """Process all PDFs in a given folder."""
+    def process_pdfs_in_folder(self, folder_path: Path, folder_name: str, pdf_files=None):
+        """Process all PDFs in a given folder (pdf_files skips re-scanning if already listed)."""
         logger.info(f"--- Processing PDFs in folder: {folder_name} ---")
-        pdf_files = list(folder_path.glob("*.pdf"))
+        if pdf_files is None:
+            pdf_files = list_pdf_files(folder_path)
         logger.info(f"Found {len(pdf_files)} PDF files: {[f.name for f in pdf_files]}")
         
         if not pdf_files: 
@@ -86,15 +120,17 @@ class ChallengeOrchestrator:
         output_dir.mkdir(exist_ok=True)
         logger.info(f"Output directory: {output_dir}")
         
-        for pdf_file in pdf_files:
+        for pdf_file, result in self._extract_outlines(pdf_files):
             try:
-                result = self.structure_extractor.extract_pdf_outline(str(pdf_file))
                 output_path = output_dir / f"{pdf_file.stem}_outline.json"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=4, ensure_ascii=False)
+                write_outline_json(result, output_path)
                 logger.info(f"Saved outline to {output_path}")
             except Exception as e:
                 logger.error(f"Error processing {pdf_file.name}: {e}")
 
 if __name__ == "__main__":
-    ChallengeOrchestrator().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract structured outlines from PDFs.")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse parsed page data of unchanged PDFs from output/.cache")
+    args = parser.parse_args()
+    ChallengeOrchestrator(use_cache=args.cache).run()
\ No newline at end of file
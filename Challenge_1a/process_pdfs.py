@@ -1,101 +1,215 @@
+import os
 import re
+import argparse
+import json
+import hashlib
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 try:
     import pdfplumber
-    from PyPDF2 import PdfReader
 except ImportError as e:
     logging.error(f"Required libraries not installed for Round 1A: {e}")
     raise
 
+try:
+    import orjson # Optional: much faster JSON output (pip install orjson)
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+def write_outline_json(result: Dict[str, Any], out_file) -> None:
+    """Serialize an outline to out_file, using orjson when it is installed."""
+    if orjson is not None:
+        Path(out_file).write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+        return
+    # Same layout as orjson's OPT_INDENT_2, so output bytes don't depend on which path runs
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(result, indent=2, ensure_ascii=False))
+
+def list_pdf_files(folder) -> List[Path]:
+    """List PDF files directly inside a folder using a single directory scan."""
+    with os.scandir(folder) as entries:
+        return sorted(Path(e.path) for e in entries
+                      if e.name.lower().endswith('.pdf') and e.is_file())
+
+def list_subfolders(folder) -> List[Path]:
+    """List immediate subdirectories of a folder using a single directory scan."""
+    with os.scandir(folder) as entries:
+        return sorted(Path(e.path) for e in entries if e.is_dir())
+
 class PDFStructureExtractor:
-    def __init__(self):
-        self.heading_patterns = [
-            r'^\d+\.\s+[A-Z]',          # e.g., "1. Introduction"
-            r'^[A-Z][A-Z\s]{5,}[A-Z]$',  # ALL CAPS HEADING
-            r'^\d+\.\d+\.?\s+',         # e.g., "1.1 Background"
-            r'^\d+\.\d+\.\d+\.?\s+',     # e.g., "1.1.1 Details"
-        ]
-
-    def extract_pdf_outline(self, pdf_path: str) -> Dict[str, Any]:
-        """Main function to extract structured outline from PDF."""
+    # Numbered-heading prefixes, compiled once and shared by all instances
+    _H1_NUM = re.compile(r'^\d+\.\s')
+    _H2_NUM = re.compile(r'^\d+\.\d+\.?\s')
+    _H3_NUM = re.compile(r'^\d+\.\d+\.\d+\.?\s')
+
+    # Bump when the shape of cached parse data changes
+    _CACHE_VERSION = 1
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        # Optional on-disk cache of raw pdfplumber output; classification always re-runs
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # In-process reuse, bounded and only when caching is enabled
+            self._get_parsed = lru_cache(maxsize=32)(self._load_or_parse)
+
+    def extract_pdf_outline(self, pdf_path: str, page_limit: Optional[int] = None) -> Dict[str, Any]:
+        """Main function to extract structured outline from PDF (optionally only the first page_limit pages)."""
         try:
             logger.info(f"Starting extraction for {Path(pdf_path).name}")
-            title = self._extract_title(pdf_path)
-            headings = self._extract_headings(pdf_path)
+            if self.cache_dir:
+                path = Path(pdf_path).resolve()
+                stat = path.stat()
+                parsed = self._get_parsed(str(path), stat.st_size, stat.st_mtime_ns, page_limit)
+                title = self._title_from_metadata(parsed["metadata_title"]) or \
+                    self._title_from_words(parsed["words"], parsed["page_height"])
+                headings = self._extract_headings(parsed["pages"], path.name)
+            else:
+                # Open the document once and reuse it for both title and headings
+                with pdfplumber.open(pdf_path) as pdf:
+                    title = self._extract_title_from_pdf(pdf)
+                    pages = pdf.pages if page_limit is None else pdf.pages[:page_limit]
+                    # Lazy, so pages past the heading budget are never laid out
+                    page_lines = (self._page_lines(page) for page in pages)
+                    headings = self._extract_headings(page_lines, Path(pdf_path).name)
             return self._generate_outline_json(title, headings)
         except Exception as e:
             logger.error(f"Error extracting from {Path(pdf_path).name}: {e}")
             return {"title": "", "outline": [], "error": str(e)}
 
-    def _extract_title(self, pdf_path: str) -> str:
-        """Extract document title from metadata or first page."""
+    def _page_lines(self, page) -> List[str]:
+        """Text of every layout line on a pdfplumber page."""
+        return [line['text'] for line in page.extract_text_lines(layout=True, strip=True)]
+
+    def _first_page_words(self, pdf):
+        """Words and height of the first page, used for the title fallback."""
+        first_page = pdf.pages[0]
+        return first_page.extract_words(keep_blank_chars=False, use_text_flow=True), first_page.height
+
+    def _parse_pdf(self, pdf_path: str, page_limit: Optional[int]) -> Dict[str, Any]:
+        """Run every pdfplumber extraction the classifiers need, as plain JSON-able data."""
+        with pdfplumber.open(pdf_path) as pdf:
+            words, page_height = self._first_page_words(pdf) if pdf.pages else ([], 0)
+            pages = pdf.pages if page_limit is None else pdf.pages[:page_limit]
+            return {
+                "metadata_title": (pdf.metadata or {}).get('Title'),
+                "words": words,
+                "page_height": page_height,
+                "pages": [self._page_lines(page) for page in pages],
+            }
+
+    def _cache_file(self, path: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(path.encode('utf-8')).hexdigest()}.json"
+
+    def _load_or_parse(self, path: str, size: int, mtime_ns: int, page_limit: Optional[int]) -> Dict[str, Any]:
+        """Return parsed page data from the disk cache if the PDF is unchanged, else parse and store it."""
+        key = [self._CACHE_VERSION, size, mtime_ns, page_limit]
+        cache_file = self._cache_file(path)
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                if pdf_reader.metadata and pdf_reader.metadata.title:
-                    title = pdf_reader.metadata.title.strip()
-                    if len(title) > 5: return title
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            parsed = entry["parsed"]
+            if entry["key"] == key and isinstance(parsed["words"], list) and \
+                    all(isinstance(lines, list) for lines in parsed["pages"]):
+                logger.info(f"Using cached page data for {Path(path).name}")
+                return parsed
+        except (OSError, ValueError, KeyError, TypeError):
+            pass # Missing, unreadable or malformed entry: treat as a cache miss
+
+        parsed = self._parse_pdf(path, page_limit)
+        try:
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "parsed": parsed}, ensure_ascii=False))
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not write cache entry for {Path(path).name}: {e}")
+        return parsed
+
+    def _extract_title_from_pdf(self, pdf) -> str:
+        """Extract document title from metadata or the first page of an open pdfplumber document."""
+        title = self._title_from_metadata((pdf.metadata or {}).get('Title'))
+        if title: return title # Skip first-page word extraction entirely
+        try:
+            return self._title_from_words(*self._first_page_words(pdf))
         except Exception:
-            pass # Fallback to text extraction
+            return "Untitled Document"
+
+    def _title_from_metadata(self, title) -> str:
+        """Metadata title if it is long enough to be meaningful, else ""."""
+        if isinstance(title, str) and len(title.strip()) > 5:
+            return title.strip()
+        return ""
 
+    def _title_from_words(self, words, page_height: float) -> str:
+        """Title from the largest-font words on the top half of the first page."""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                first_page = pdf.pages[0]
-                words = first_page.extract_words(keep_blank_chars=False, use_text_flow=True)
-                # Assume the line with the largest font size on the top half of the page is the title
-                top_half_words = [w for w in words if w['top'] < first_page.height / 2]
-                if not top_half_words: return "Untitled Document"
-                
-                max_size = max(w['size'] for w in top_half_words)
-                title_words = [w['text'] for w in top_half_words if w['size'] > max_size * 0.9]
-                return " ".join(title_words) if title_words else "Untitled Document"
+            # Assume the line with the largest font size on the top half of the page is the title
+            half_height = page_height / 2
+            # Filter to the top half and track the largest size in the same pass
+            top_half_words, max_size = [], 0
+            for w in words:
+                if w['top'] < half_height:
+                    top_half_words.append((w['text'], w['size']))
+                    if w['size'] > max_size: max_size = w['size']
+            if not top_half_words: return "Untitled Document"
+            
+            title_words = [text for text, size in top_half_words if size > max_size * 0.9]
+            return " ".join(title_words) if title_words else "Untitled Document"
         except Exception:
             return "Untitled Document"
 
-    def _extract_headings(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Extract headings with their levels and page numbers."""
-        headings = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                logger.debug(f"Processing page {i+1}/{len(pdf.pages)} for headings...")
-                lines = page.extract_text_lines(layout=True, strip=True)
-                for line in lines:
-                    text = line['text']
-                    if len(text) < 4 or len(text) > 200: continue
-                    
-                    level = self._determine_heading_level(text)
-                    if level:
-                        headings.append({
-                            "level": level,
-                            "text": text,
-                            "page": i + 1,
-                        })
-        
-        # Post-process to remove duplicates and limit size
-        seen = set()
-        unique_headings = []
-        for h in headings:
-            key = (h['text'], h['page'])
-            if key not in seen:
-                seen.add(key)
-                unique_headings.append(h)
+    def _extract_headings(self, page_lines, pdf_name: str) -> List[Dict[str, Any]]:
+        """Extract headings with their levels and page numbers from per-page line texts."""
+        # Remove duplicates (keeping first occurrence) as we go so we can stop
+        # parsing pages once the heading budget is used up
+        unique = {}
+        for i, lines in enumerate(page_lines):
+            logger.debug(f"Processing page {i+1} for headings...")
+            for h in self._extract_page_headings(lines, i + 1):
+                unique.setdefault((h['text'], h['page']), h)
+                if len(unique) == 150: break # Limit to 150 headings
+            if len(unique) == 150: break
+        unique_headings = list(unique.values())
         
-        logger.info(f"Found {len(unique_headings)} unique headings in {Path(pdf_path).name}.")
-        return unique_headings[:150] # Limit to 150 headings
+        logger.info(f"Found {len(unique_headings)} unique headings in {pdf_name}.")
+        return unique_headings
+
+    def _extract_page_headings(self, lines: List[str], page_number: int) -> List[Dict[str, Any]]:
+        """Extract heading candidates from the line texts of a single page."""
+        headings = []
+        for text in lines:
+            if len(text) < 4 or len(text) > 200: continue
+            
+            level = self._determine_heading_level(text)
+            if level:
+                headings.append({
+                    "level": level,
+                    "text": text,
+                    "page": page_number,
+                })
+        return headings
 
     def _determine_heading_level(self, text: str) -> str:
         """Determines heading level based on patterns."""
-        if re.match(r'^\d+\.\s', text): return "H1"
-        if re.match(r'^\d+\.\d+\.?\s', text): return "H2"
-        if re.match(r'^\d+\.\d+\.\d+\.?\s', text): return "H3"
-        if text.isupper() and len(text.split()) < 7: return "H1"
-        if text.istitle() and len(text.split()) < 10 and not text.endswith('.'): return "H2"
+        # Longest numbering prefix first so deeper levels are never shadowed
+        if self._H3_NUM.match(text): return "H3"
+        if self._H2_NUM.match(text): return "H2"
+        if self._H1_NUM.match(text): return "H1"
+        # A leading lowercase letter rules out both all-caps and title case, so
+        # most body text is rejected before any case check or split
+        if text[:1].islower(): return ""
+        word_count = None
+        if text.isupper():
+            word_count = len(text.split())
+            if word_count < 7: return "H1"
+        if not text.endswith('.') and text.istitle():
+            if word_count is None: word_count = len(text.split())
+            if word_count < 10: return "H2"
         return "" # Not a heading
 
     def _generate_outline_json(self, title: str, headings: List[Dict]) -> Dict[str, Any]:
@@ -108,13 +222,12 @@ class PDFStructureExtractor:
         }
 
 # Batch main function for orchestrated extraction
-def main():
-    import json
+def main(use_cache: bool = False):
     input_root = Path("/app/input")
     output_root = Path("/app/output")
     output_root.mkdir(parents=True, exist_ok=True)
     
-    extractor = PDFStructureExtractor()
+    extractor = PDFStructureExtractor(str(output_root / ".cache") if use_cache else None)
     
     if not input_root.exists():
         logger.error(f"Input directory not found: {input_root}")
@@ -123,26 +236,22 @@ def main():
     logger.info(f"Scanning for PDFs in {input_root}")
     
     # Process PDFs directly in input folder
-    direct_pdfs = list(input_root.glob("*.pdf"))
+    direct_pdfs = list_pdf_files(input_root)
     if direct_pdfs:
         logger.info(f"Found {len(direct_pdfs)} PDFs directly in input folder")
         for pdf_file in direct_pdfs:
             try:
                 result = extractor.extract_pdf_outline(str(pdf_file))
                 out_file = output_root / f"{pdf_file.stem}_outline.json"
-                with open(out_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=4, ensure_ascii=False)
+                write_outline_json(result, out_file)
                 logger.info(f"Saved outline for {pdf_file.name} to {out_file}")
             except Exception as e:
                 logger.error(f"Error processing {pdf_file.name}: {e}")
     
     # Process PDFs in all subfolders
-    for folder in input_root.iterdir():
-        if not folder.is_dir():
-            continue
-        
+    for folder in list_subfolders(input_root):
         logger.info(f"Processing folder: {folder.name}")
-        pdf_files = list(folder.glob("*.pdf"))
+        pdf_files = list_pdf_files(folder)
         
         if not pdf_files:
             logger.info(f"No PDFs found in {folder.name}")
@@ -157,12 +266,14 @@ def main():
             try:
                 result = extractor.extract_pdf_outline(str(pdf_file))
                 out_file = folder_out / f"{pdf_file.stem}_outline.json"
-                with open(out_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=4, ensure_ascii=False)
+                write_outline_json(result, out_file)
                 logger.info(f"Saved outline for {pdf_file.name} to {out_file}")
             except Exception as e:
                 logger.error(f"Error processing {pdf_file.name}: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract structured outlines from PDFs in /app/input.")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse parsed page data of unchanged PDFs from /app/output/.cache")
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    main()
\ No newline at end of file
+    main(use_cache=parser.parse_args().cache)
\ No newline at end of file